@@ -1,36 +1,135 @@
 import streamlit as st
+import atexit
+import functools
+import hashlib
+import io
+import logging
 import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from google import genai
 from google.genai import types
-import tempfile # For handling temporary files
-from convert_file_md import convert_md_to_pdf # Added convert_md_to_pdf
+from convert_file_md import convert_md_content_to_pdf
 from dotenv import load_dotenv
 # PIL.Image is not directly used in this refactoring, image bytes are used
 # from PIL import Image # Not strictly needed if only using getvalue()
 
-# Initialize the Gemini Client
-# This will use the GOOGLE_API_KEY environment variable.
 load_dotenv()
-client = None
+
+log = logging.getLogger(__name__)
+
+GEMINI_MODEL = 'gemini-2.5-flash-preview-04-17' # User updated model
+MAX_CONCURRENT_EXTRACTIONS = 4 # Upper bound on parallel Gemini calls for multi-file uploads
+INLINE_UPLOAD_LIMIT = 512 * 1024 # Larger files (and all PDFs) go through the Gemini File API
+BATCH_EXTRACTION_MIN_FILES = 8 # Uploads this large are extracted through the Gemini Batch API
+BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+GEMINI_TIMEOUT_MS = 60_000 # Per-request timeout for Gemini calls
+MEDIA_SESSION_TTL = 24 * 60 * 60 # Chat images of sessions idle this long (seconds) are deleted
+# Connection pool for the shared client; sized for concurrent sessions and multi-file extraction
+GEMINI_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+# Initialize the Gemini Client once per server process.
+# This will use the GOOGLE_API_KEY environment variable. st.cache_resource shares the
+# client (and its underlying HTTP connection pool) across sessions and script reruns.
+@st.cache_resource(show_spinner=False)
+def get_gemini_client():
+    try:
+        return genai.Client(
+            http_options=types.HttpOptions(
+                timeout=GEMINI_TIMEOUT_MS,
+                client_args={'limits': GEMINI_HTTP_LIMITS},
+            )
+        )
+    except Exception as e:
+        # We'll let the app try to run; main() reports the missing client to the user.
+        return None
+
+# Convert the current Markdown document to PDF bytes for the download button.
+# Cached on the Markdown string so reruns with an unchanged document skip the conversion.
+@st.cache_data(show_spinner=False, max_entries=32)
+def md_to_pdf_bytes(md: str) -> bytes | None:
+    return convert_md_content_to_pdf(md)
+
+# Fingerprint an uploaded file from its size and first 4KB. getvalue() returns the BytesIO's
+# shared bytes without copying (getbuffer() would copy the whole file), so only the head is copied.
+def fingerprint_upload(uploaded_file, head_size=4096):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(str(uploaded_file.size).encode())
+    digest.update(uploaded_file.getvalue()[:head_size])
+    return digest.hexdigest()
+
+# Process-wide directory for uploaded images shown in the chat, removed when the server exits.
+# It is kept out of st.cache_resource, whose "Clear cache" menu item would delete every session's
+# images, and named after the server process because Streamlit re-executes this module on each rerun.
+MEDIA_DIR = os.path.join(tempfile.gettempdir(), f"docgen_media_{os.getpid()}")
 try:
-    client = genai.Client()
-except Exception as e:
-    # Show error in the main app area if sidebar is removed or not primary for this
-    # st.error(f"Failed to initialize Gemini Client. Ensure GOOGLE_API_KEY is set and valid. Error: {e}")
-    # We'll let the app try to run, and errors will appear if AI features are used without a client.
-    pass
+    os.makedirs(MEDIA_DIR, mode=0o700)
+    atexit.register(shutil.rmtree, MEDIA_DIR, ignore_errors=True)
+except FileExistsError:
+    pass # Created by an earlier run of this script in the same process
+
+# This session's image directory inside MEDIA_DIR
+def get_session_media_dir():
+    media_dir = st.session_state.get("_media_dir")
+    if media_dir is None or not os.path.isdir(media_dir):
+        media_dir = tempfile.mkdtemp(prefix="session_", dir=MEDIA_DIR)
+        st.session_state["_media_dir"] = media_dir
+    return media_dir
+
+# Delete this session's images that no chat message references any more, and the image
+# directories of sessions that have been idle for longer than MEDIA_SESSION_TTL.
+def prune_media(doc_types):
+    session_dir = get_session_media_dir()
+    os.utime(session_dir) # Mark this session as active
+    referenced = {
+        message.get("image_path")
+        for doc_type in doc_types
+        for message in st.session_state.get(f"{doc_type}_messages", [])
+    }
+    for entry in os.scandir(session_dir):
+        if entry.path not in referenced:
+            os.remove(entry.path)
+    cutoff = time.time() - MEDIA_SESSION_TTL
+    for entry in os.scandir(MEDIA_DIR):
+        if entry.path != session_dir and entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+# Write an uploaded image to this session's media directory once and return its path. Files are
+# named by content hash, so re-uploads of the same image reuse the existing file.
+def persist_uploaded_image(uploaded_file):
+    image_data = uploaded_file.getvalue()
+    image_name = hashlib.blake2b(image_data, digest_size=16).hexdigest() + os.path.splitext(uploaded_file.name)[1]
+    image_path = os.path.join(get_session_media_dir(), image_name)
+    if not os.path.exists(image_path):
+        with open(image_path, "wb") as image_file:
+            image_file.write(image_data)
+    return image_path
 
 # Helper function to add messages to chat history (now stores simple dicts)
-def add_message_to_history(role, content, doc_type, image_bytes=None, image_caption=None):
+def add_message_to_history(role, content, doc_type, image_path=None, image_caption=None):
     if f"{doc_type}_messages" not in st.session_state:
         st.session_state[f"{doc_type}_messages"] = []
     message_data = {"role": role, "content": content}
-    if image_bytes and image_caption:
+    if image_path and image_caption:
         # For display purposes, store image info. For API, image part will be handled separately.
-        message_data["image_bytes"] = image_bytes
+        # Only the path is kept, so the session doesn't hold the image bytes for the whole chat.
+        message_data["image_path"] = image_path
         message_data["image_caption"] = image_caption
     st.session_state[f"{doc_type}_messages"].append(message_data)
 
+    # Keep the Gemini-ready history in step with the display history, so each turn only
+    # builds the Content for its own message instead of re-serializing the whole chat.
+    if f"{doc_type}_api_history" not in st.session_state:
+        st.session_state[f"{doc_type}_api_history"] = []
+    api_role = "model" if role == "assistant" else role
+    if api_role in ["user", "model"]:
+        st.session_state[f"{doc_type}_api_history"].append(
+            types.Content(role=api_role, parts=[types.Part(text=content)])
+        )
+
 # Helper to prepare `contents` for Gemini API from session state messages
 def prepare_gemini_contents(doc_type, current_user_prompt_text=None, image_part_for_prompt=None):
     contents = []
@@ -42,78 +141,137 @@ def prepare_gemini_contents(doc_type, current_user_prompt_text=None, image_part_
         role = msg["role"]
         # For API, text content is primary. Image display handled by UI.
         # If an image was part of a specific historical turn for API context (rare for this app), it would need special handling here.
-        parts = [types.Part.from_text(text=msg["content"])]
+        parts = [types.Part(text=msg["content"])]
         contents.append(types.Content(role=role, parts=parts))
 
     # Add the current user prompt if it's not already the last one in history
     # (add_message_to_history usually adds it, so this might be redundant or for specific cases)
     if current_user_prompt_text:
-        current_parts = [types.Part.from_text(text=current_user_prompt_text)]
+        current_parts = [types.Part(text=current_user_prompt_text)]
         if image_part_for_prompt: # If the current prompt is tied to an image (e.g., extraction)
             current_parts.insert(0, image_part_for_prompt) # Typically image first, then text
         contents.append(types.Content(role="user", parts=current_parts))
     
     return contents
 
-# Function to handle the chat interface for a given document type (Quotation or Bill)
-def run_chat_interface(doc_type_name: str):
-    st.header(f"{doc_type_name} Generator Chat")
+# Build the API Part for an uploaded file. Small images are sent inline; PDFs and large files
+# are uploaded through the File API so the request only carries a reference to them.
+def build_file_part(client, raw_data, mime_type):
+    if len(raw_data) <= INLINE_UPLOAD_LIMIT and mime_type != "application/pdf":
+        return types.Part(inline_data=types.Blob(data=raw_data, mime_type=mime_type))
+    try:
+        file_ref = client.files.upload(file=io.BytesIO(raw_data), config={'mime_type': mime_type})
+    except Exception as e:
+        # Fall back to sending the bytes inline if the File API is unavailable
+        log.warning("Gemini File API upload failed, sending %s inline instead: %s", mime_type, e)
+        return types.Part(inline_data=types.Blob(data=raw_data, mime_type=mime_type))
+    return types.Part.from_uri(file_uri=file_ref.uri, mime_type=mime_type)
+
+# Extract a document from an uploaded file using the given extraction prompt.
+# Persisted to disk and keyed on the file's content hash, so extracting the same file again
+# (even after an app restart) is a cache lookup. The leading underscore keeps Streamlit from
+# hashing the raw bytes themselves.
+@st.cache_data(persist="disk", max_entries=500, show_spinner=False)
+def extract_from_file(file_hash: str, mime_type: str, prompt: str, _raw_data: bytes) -> str:
+    client = get_gemini_client()
+    contents = build_extraction_contents(client, _raw_data, mime_type, prompt)
+    response = client.models.generate_content(model=GEMINI_MODEL, contents=contents)
+    if not response.text:
+        # Raise rather than return, so a blocked or empty response isn't persisted to the cache
+        reason = response.prompt_feedback.block_reason if response.prompt_feedback else None
+        if reason is None and response.candidates:
+            reason = response.candidates[0].finish_reason
+        raise ValueError(f"Gemini returned no text (reason: {reason or 'unknown'})")
+    return response.text
+
+# Self-contained request contents for extracting one file: system prompt, then the file and template
+def build_extraction_contents(client, raw_data, mime_type, prompt):
+    contents = []
+    if SYSTEM_PROMPT.strip():
+        contents.append(types.Content(role="user", parts=[types.Part(text=SYSTEM_PROMPT)]))
+    contents.append(types.Content(role="user", parts=[build_file_part(client, raw_data, mime_type), types.Part(text=prompt)]))
+    return contents
 
-    if f"{doc_type_name}_messages" not in st.session_state:
-        st.session_state[f"{doc_type_name}_messages"] = []
-    if f"current_{doc_type_name.lower()}_md" not in st.session_state:
-        st.session_state[f"current_{doc_type_name.lower()}_md"] = None
-    if f"{doc_type_name}_uploaded_file_info" not in st.session_state:
-        st.session_state[f"{doc_type_name}_uploaded_file_info"] = None
-    if f"{doc_type_name}_last_uploaded_filename" not in st.session_state:
-        st.session_state[f"{doc_type_name}_last_uploaded_filename"] = None
+# Submit one Gemini batch job holding an extraction request per file and return the job name.
+# Batch jobs trade latency for throughput and quota, so they are only used for large uploads.
+def submit_extraction_batch(client, file_infos, prompt_text):
+    inlined_requests = [
+        types.InlinedRequest(contents=build_extraction_contents(client, file_info["data"], file_info["type"], prompt_text))
+        for file_info in file_infos
+    ]
+    batch_job = client.batches.create(model=GEMINI_MODEL, src=inlined_requests)
+    return batch_job.name
+
+# Run extraction for each uploaded file, concurrently when there are several, and return the
+# response text (or the raised exception) for each file, in upload order.
+def extract_files(file_infos, prompt_text):
+    def extract(file_info):
+        raw_data = file_info["data"]
+        return extract_from_file(hashlib.blake2b(raw_data).hexdigest(), file_info["type"], prompt_text, raw_data)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=min(len(file_infos), MAX_CONCURRENT_EXTRACTIONS)) as pool:
+        futures = [pool.submit(extract, file_info) for file_info in file_infos]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    return results
+
+# Poll a pending batch extraction job. Runs as a fragment on a timer so only this block reruns
+# while the job is in progress; once it finishes the results are added to the chat history.
+@st.fragment(run_every="5s")
+def _batch_extraction_fragment(doc_type_name: str):
+    pending_batch = st.session_state[f"{doc_type_name}_pending_batch"]
+    if not pending_batch:
+        return
+    try:
+        batch_job = get_gemini_client().batches.get(name=pending_batch["name"])
+    except Exception as e:
+        st.warning(f"Could not check batch extraction status: {e}")
+        return
+    if batch_job.state.name not in BATCH_DONE_STATES:
+        st.info(f"Extracting {len(pending_batch['files'])} documents in a batch job ({batch_job.state.name})...")
+        return
 
+    st.session_state[f"{doc_type_name}_pending_batch"] = None
+    if batch_job.state.name != "JOB_STATE_SUCCEEDED":
+        add_message_to_history("assistant", f"Error: Batch extraction ended with state {batch_job.state.name}.", doc_type_name)
+    else:
+        # Inlined responses come back in the same order as the submitted requests
+        for file_name, inlined_response in zip(pending_batch["files"], batch_job.dest.inlined_responses):
+            if inlined_response.response:
+                ai_response_text = inlined_response.response.text
+                add_message_to_history("assistant", ai_response_text, doc_type_name)
+                st.session_state[f"current_{doc_type_name.lower()}_md"] = ai_response_text # Update current doc
+            else:
+                add_message_to_history("assistant", f"Error with Gemini API for `{file_name}`: {inlined_response.error}", doc_type_name)
+    st.rerun()
+
+# Chat history for a document type, rendered into the reserved history container
+def _render_history(doc_type_name: str):
     for message in st.session_state[f"{doc_type_name}_messages"]:
         with st.chat_message(message["role"]):
-            if "image_bytes" in message and message["image_bytes"]:
+            if message.get("image_path") and os.path.exists(message["image_path"]):
                 # Display image if it's part of the message (e.g., user uploaded image confirmation)
-                st.image(message["image_bytes"], caption=message.get("image_caption", "Uploaded Image"), use_container_width=True)
+                st.image(message["image_path"], caption=message.get("image_caption", "Uploaded Image"), use_container_width=True)
             st.markdown(message["content"])
 
-    uploaded_file = st.file_uploader(
-        f"Upload a handwritten {doc_type_name} or an existing {doc_type_name} document (optional)",
-        type=['jpg', 'jpeg', 'png', 'pdf'],
-        key=f"{doc_type_name}_chat_uploader"
-    )
-
-    if uploaded_file is not None:
-        if st.session_state[f"{doc_type_name}_last_uploaded_filename"] != uploaded_file.name:
-            uploaded_file_data = uploaded_file.getvalue()
-            st.session_state[f"{doc_type_name}_uploaded_file_info"] = {"name": uploaded_file.name, "type": uploaded_file.type, "data": uploaded_file_data}
-            st.session_state[f"{doc_type_name}_last_uploaded_filename"] = uploaded_file.name
-            
-            user_msg_text = f"Uploaded `{uploaded_file.name}`. How should I process this for a {doc_type_name}? (e.g., 'Extract details', 'Summarize')"
-            if uploaded_file.type.startswith("image/"):
-                add_message_to_history("user", user_msg_text, doc_type_name, image_bytes=uploaded_file_data, image_caption=f"Uploaded: {uploaded_file.name}")
-            else:
-                add_message_to_history("user", user_msg_text, doc_type_name)
-            st.rerun()
-
-    # Download button for the current document
+# Download section for the current document. Runs as a fragment so clicking the
+# download button only reruns this block instead of the whole chat interface.
+@st.fragment
+def _download_fragment(doc_type_name: str):
     if st.session_state[f"current_{doc_type_name.lower()}_md"]:
         st.markdown("---<y_bin_412>Download Current Document---") # Visual separator
         current_md_content = st.session_state[f"current_{doc_type_name.lower()}_md"]
-        # Create a temporary MD file to convert
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".md", mode="w", encoding="utf-8") as tmp_md_file:
-            tmp_md_file.write(current_md_content)
-            tmp_md_path = tmp_md_file.name
-        
-        # Define path for the temporary PDF output
-        tmp_pdf_path = tmp_md_path.replace(".md", ".pdf")
-        pdf_conversion_success = False
+        pdf_bytes = None
         try:
-            pdf_conversion_success = convert_md_to_pdf(tmp_md_path, tmp_pdf_path)
+            pdf_bytes = md_to_pdf_bytes(current_md_content)
         except Exception as e:
             st.error(f"PDF conversion error for download: {e}")
 
-        if pdf_conversion_success and os.path.exists(tmp_pdf_path):
-            with open(tmp_pdf_path, "rb") as pdf_file:
-                pdf_bytes = pdf_file.read()
+        if pdf_bytes:
             st.download_button(
                 label=f"Download Current {doc_type_name} as PDF",
                 data=pdf_bytes,
@@ -121,101 +279,162 @@ def run_chat_interface(doc_type_name: str):
                 mime="application/pdf",
                 key=f"{doc_type_name}_download_pdf_chat"
             )
-            # Clean up temporary files
-            if os.path.exists(tmp_md_path): os.remove(tmp_md_path)
-            if os.path.exists(tmp_pdf_path): os.remove(tmp_pdf_path)
+        # else: st.warning(f"Could not prepare PDF for download at this moment.") # Optional warning
+
+# Function to handle the chat interface for a given document type (Quotation or Bill)
+def run_chat_interface(doc_type_name: str):
+    st.header(f"{doc_type_name} Generator Chat")
+    client = get_gemini_client()
+
+    session_defaults = {
+        f"{doc_type_name}_messages": [],
+        f"current_{doc_type_name.lower()}_md": None,
+        f"{doc_type_name}_api_history": [],
+        f"{doc_type_name}_uploaded_files_info": [],
+        f"{doc_type_name}_upload_hashes": set(),
+        f"{doc_type_name}_pending_batch": None,
+    }
+    for key, default in session_defaults.items():
+        st.session_state.setdefault(key, default)
+
+    # Reserve the history area above the uploader; it is filled after upload handling so that
+    # messages for newly uploaded files show up in this same run without an extra rerun.
+    history_container = st.container()
+
+    uploaded_files = st.file_uploader(
+        f"Upload handwritten {doc_type_name}s or existing {doc_type_name} documents (optional)",
+        type=['jpg', 'jpeg', 'png', 'pdf'],
+        accept_multiple_files=True,
+        key=f"{doc_type_name}_chat_uploader"
+    )
+
+    # Compare a cheap fingerprint rather than the filename, so a re-upload under the same
+    # name with different content is picked up and the full bytes are only copied on a miss.
+    # Forget files that were removed from the uploader so they can be uploaded again.
+    upload_hashes = {fingerprint_upload(uploaded_file): uploaded_file for uploaded_file in uploaded_files}
+    seen_upload_hashes = st.session_state[f"{doc_type_name}_upload_hashes"]
+    seen_upload_hashes.intersection_update(upload_hashes)
+
+    new_uploads = [(upload_hash, uploaded_file) for upload_hash, uploaded_file in upload_hashes.items() if upload_hash not in seen_upload_hashes]
+    for upload_hash, uploaded_file in new_uploads:
+        # getvalue() returns the uploader's bytes object itself, so this keeps a reference, not a copy
+        uploaded_file_data = uploaded_file.getvalue()
+        st.session_state[f"{doc_type_name}_uploaded_files_info"].append({"name": uploaded_file.name, "type": uploaded_file.type, "data": uploaded_file_data})
+        seen_upload_hashes.add(upload_hash)
+
+        user_msg_text = f"Uploaded `{uploaded_file.name}`. How should I process this for a {doc_type_name}? (e.g., 'Extract details', 'Summarize')"
+        if uploaded_file.type.startswith("image/"):
+            add_message_to_history("user", user_msg_text, doc_type_name, image_path=persist_uploaded_image(uploaded_file), image_caption=f"Uploaded: {uploaded_file.name}")
         else:
-            if os.path.exists(tmp_md_path): os.remove(tmp_md_path)
-            # st.warning(f"Could not prepare PDF for download at this moment.") # Optional warning
+            add_message_to_history("user", user_msg_text, doc_type_name)
+
+    with history_container:
+        _render_history(doc_type_name)
+
+    # Status of a running batch extraction, if any
+    if st.session_state[f"{doc_type_name}_pending_batch"]:
+        _batch_extraction_fragment(doc_type_name)
+
+    # Download button for the current document
+    _download_fragment(doc_type_name)
 
     if user_chat_input := st.chat_input(f"Chat about your {doc_type_name}..."):
         add_message_to_history("user", user_chat_input, doc_type_name)
         api_call_needed = True # Flag to determine if we should call Gemini
         gemini_api_contents = []
 
-        # Define uploaded_info and current_doc_md before they are used
-        uploaded_info = st.session_state.get(f"{doc_type_name}_uploaded_file_info")
-        current_doc_md = st.session_state.get(f"current_{doc_type_name.lower()}_md")
+        # Define pending_files before it is used
+        pending_files = st.session_state.get(f"{doc_type_name}_uploaded_files_info")
         user_input_lower = user_chat_input.lower() # Still useful for other potential logic, but not for upload triggering
         
         final_prompt_for_api = user_chat_input # Default to raw user input
-        image_part_for_current_api_call = None
+        files_for_current_api_call = [] # Uploaded file infos to run extraction on
 
-        if uploaded_info: # If a file was uploaded in the previous interaction and is pending processing
-            st.write(f"Debug: Prioritizing processing of previously uploaded file: {uploaded_info.get('name', 'N/A')}")
-            raw_data = uploaded_info.get('data')
-            mime_type_for_api = uploaded_info.get('type')
-            
-            if raw_data and mime_type_for_api:
-                # Construct Part directly for image/blob data
-                image_part_for_current_api_call = types.Part(inline_data=types.Blob(data=raw_data, mime_type=mime_type_for_api))
-                # Select the appropriate extraction template based on doc_type_name
-                if doc_type_name == "Quotation":
-                    final_prompt_for_api = st.session_state.get('quotation_extraction_prompt_template', '').format(doc_type_name=doc_type_name)
-                else: # For "Bill" or other types needing extraction
-                    final_prompt_for_api = st.session_state.get('bill_extraction_prompt_template', '').format(doc_type_name=doc_type_name)
+        if pending_files: # If files were uploaded in previous interactions and are pending processing
+            for uploaded_info in pending_files:
+                if uploaded_info.get('data') and uploaded_info.get('type'):
+                    files_for_current_api_call.append(uploaded_info)
+                else:
+                    add_message_to_history("assistant", f"Error: Uploaded file `{uploaded_info.get('name', 'N/A')}` data is missing or corrupt.", doc_type_name)
+
+            if files_for_current_api_call:
+                final_prompt_for_api = get_extraction_prompt(doc_type_name)
                 # The user_chat_input for this turn is considered a confirmation/go-ahead.
                 # The main instruction for LLM is the extraction template.
             else:
                 api_call_needed = False
-                add_message_to_history("assistant", "Error: Uploaded file data is missing or corrupt.", doc_type_name)
             
             # Clear uploaded file info after this processing attempt
-            st.session_state[f"{doc_type_name}_uploaded_file_info"] = None
-            st.session_state[f"{doc_type_name}_last_uploaded_filename"] = None
+            st.session_state[f"{doc_type_name}_uploaded_files_info"] = []
 
-        elif current_doc_md: # No pending upload to process, but there's an existing document
-            st.write("Debug: Contextualizing with existing document for modification/query.")
-            final_prompt_for_api = f"Here is the current {doc_type_name} document (in Markdown):\n------------------------\n{current_doc_md}\n------------------------\n\nBased on the above document, please address my following request:\n{user_chat_input}"
-            
-        else: # No pending upload, no current document. Treat as new generation from user_chat_input.
-            st.write("Debug: Creating new document from instructions (or general query).")
-            # final_prompt_for_api is already user_chat_input (the default), no changes needed here.
+        # else: No pending upload. final_prompt_for_api is already user_chat_input (the default).
+        # If there's an existing document it was the assistant's latest reply, so it is already part
+        # of the conversation history sent below and doesn't need to be repeated in the prompt.
         
         # Fallback if prompt ended up empty (should be rare with default to user_chat_input)
         if not final_prompt_for_api.strip():
             api_call_needed = False
             add_message_to_history("assistant", "It seems your request is empty. Please provide some instructions.", doc_type_name)
 
-        if api_call_needed:
+        if api_call_needed and len(files_for_current_api_call) >= BATCH_EXTRACTION_MIN_FILES:
+            # Large upload: hand the extraction to a batch job and let the polling fragment pick up the results
+            try:
+                with st.spinner(f"Submitting {len(files_for_current_api_call)} documents for batch extraction..."):
+                    batch_name = submit_extraction_batch(client, files_for_current_api_call, final_prompt_for_api)
+                st.session_state[f"{doc_type_name}_pending_batch"] = {
+                    "name": batch_name,
+                    "files": [uploaded_info.get('name', 'N/A') for uploaded_info in files_for_current_api_call],
+                }
+            except Exception as e:
+                # Fall back to concurrent per-file extraction below
+                st.warning(f"Batch submission failed, extracting directly instead: {e}")
+            else:
+                api_call_needed = False
+
+        if api_call_needed and files_for_current_api_call:
+            # Extraction: one self-contained request per file (system prompt + file + template),
+            # so results can be cached on the file content and several files run concurrently.
+            with st.spinner(f"Extracting {len(files_for_current_api_call)} document(s)..."):
+                results = extract_files(files_for_current_api_call, final_prompt_for_api)
+            for uploaded_info, result in zip(files_for_current_api_call, results):
+                with st.chat_message("assistant"):
+                    if isinstance(result, Exception):
+                        error_msg = f"Error with Gemini API for `{uploaded_info.get('name', 'N/A')}`: {result}"
+                        st.error(error_msg)
+                        add_message_to_history("assistant", error_msg, doc_type_name)
+                    else:
+                        st.markdown(result)
+                        add_message_to_history("assistant", result, doc_type_name)
+                        st.session_state[f"current_{doc_type_name.lower()}_md"] = result # Update current doc
+
+        elif api_call_needed:
             # Prepare conversational history for 'contents'
             gemini_api_contents = []
-            system_prompt_text = st.session_state.get('system_prompt', '')
+            system_prompt_text = SYSTEM_PROMPT
 
             # Prepend system prompt as the first user message if it exists
             if system_prompt_text.strip():
-                gemini_api_contents.append(types.Content(role="user", parts=[types.Part.from_text(text=system_prompt_text)]))
+                gemini_api_contents.append(types.Content(role="user", parts=[types.Part(text=system_prompt_text)]))
 
-            # Ensure to fetch messages *before* the current user input which is added last
-            history_messages = st.session_state.get(f"{doc_type_name}_messages", [])
-            
-            # The last message in session_state is the current user's input, which will be formatted
+            # The last entry in the API history is the current user's input, which will be formatted
             # with final_prompt_for_api and added after the history.
-            # So, iterate up to the second to last message for history.
-            for msg_data in history_messages[:-1]: 
-                api_role = "model" if msg_data["role"] == "assistant" else msg_data["role"]
-                if api_role not in ["user", "model"]:
-                    st.warning(f"Skipping historical message with invalid role: {msg_data['role']}")
-                    continue
-                gemini_api_contents.append(types.Content(role=api_role, parts=[types.Part.from_text(text=msg_data["content"])]))
+            # So, reuse everything up to the second to last entry as-is.
+            gemini_api_contents.extend(st.session_state[f"{doc_type_name}_api_history"][:-1])
             
-            # Add current user prompt with its specific prompt template and potential image
-            current_user_parts = [types.Part.from_text(text=final_prompt_for_api)]
-            if image_part_for_current_api_call: # This is for extraction
-                current_user_parts.insert(0, image_part_for_current_api_call)
-            gemini_api_contents.append(types.Content(role="user", parts=current_user_parts))
+            # Add current user prompt
+            gemini_api_contents.append(types.Content(role="user", parts=[types.Part(text=final_prompt_for_api)]))
             
             with st.chat_message("assistant"):
                 with st.spinner(f"Thinking..."):
                     try:
                         # print(f"Sending to Gemini Contents: {gemini_api_contents}") # DEBUG
-                        response = client.models.generate_content(
-                            model='gemini-2.5-flash-preview-04-17', # User updated model
+                        response_stream = client.models.generate_content_stream(
+                            model=GEMINI_MODEL,
                             contents=gemini_api_contents
                             # Removed generation_config here
                         )
-                        ai_response_text = response.text
-                        st.markdown(ai_response_text)
+                        # Render tokens as they arrive instead of waiting for the full response
+                        ai_response_text = st.write_stream(chunk.text for chunk in response_stream if chunk.text)
                         add_message_to_history("assistant", ai_response_text, doc_type_name)
                         st.session_state[f"current_{doc_type_name.lower()}_md"] = ai_response_text # Update current doc
                     except Exception as e:
@@ -225,9 +444,8 @@ def run_chat_interface(doc_type_name: str):
         st.rerun()
 
 # Define prompt templates (can be loaded from elsewhere or kept here)
-# These should be stored in session_state at app start if they are long or to avoid redefinition.
-def load_prompt_templates():
-    st.session_state['system_prompt'] = """
+# These are immutable module-level constants, so they are built once per process instead of on every rerun.
+SYSTEM_PROMPT = """
     You are an AI assistant specialized in creating and processing business documents like quotations and bills.
     Your primary goal is to help the user generate accurate, well-formatted Markdown documents based on their instructions or by extracting information from uploaded files (images or PDFs).
     Follow user instructions meticulously. For quotations and bills, pay close attention to itemized lists, pricing, quantities, totals, and terms and conditions.
@@ -251,7 +469,7 @@ def load_prompt_templates():
     
     When extracting from an uploaded file, if the file is an image or PDF of a document, use the provided few-shot examples and instructions to guide your extraction.
     """
-    st.session_state['quotation_extraction_prompt_template'] = """
+QUOTATION_EXTRACTION_PROMPT = """
     You are an expert at analyzing images of handwritten documents and converting them into structured Markdown.
     Here is an example of how to process a handwritten quotation:
     EXAMPLE INPUT: An image of a handwritten quotation, typically containing a recipient, sender, an itemized list in a table format with columns like 'Serial No.', 'Item', 'Price', 'GST', 'Final Amount', and a section for terms and conditions.
@@ -318,7 +536,7 @@ def load_prompt_templates():
     
     The output must be ONLY the clean, professional Markdown document itself, starting with the <code>&lt;!-- Leave space for letterhead --&gt;</code> comment and enclosed in <code>```markdown ... ```</code> fences, as shown in the example. Do not include any conversational text or explanations before or after the Markdown block.
     """
-    st.session_state['bill_extraction_prompt_template'] = """
+BILL_EXTRACTION_PROMPT = """
     Analyze the uploaded document (image or PDF) of a handwritten {doc_type_name}.
     Extract details and structure them clearly in Markdown format:
     - Document Type (Confirm it is a {doc_type_name})
@@ -339,15 +557,26 @@ def load_prompt_templates():
     The output must be ONLY the clean, professional Markdown document itself. Do not include any conversational text or explanations before or after the Markdown block.
     """
 
+# Select the appropriate extraction template for doc_type and fill it in.
+# doc_type only takes a couple of values, so each formatted prompt is built once per process.
+@functools.cache
+def get_extraction_prompt(doc_type: str) -> str:
+    if doc_type == "Quotation":
+        return QUOTATION_EXTRACTION_PROMPT.format(doc_type_name=doc_type)
+    # For "Bill" or other types needing extraction
+    return BILL_EXTRACTION_PROMPT.format(doc_type_name=doc_type)
+
 def main():
     st.set_page_config(layout="wide")
     st.title("AI Document Generator (Chat Mode)")
-    load_prompt_templates() # Load templates into session state
 
+    client = get_gemini_client()
     if client is None:
         st.error("Gemini Client failed to initialize. Check GOOGLE_API_KEY.")
         return
 
+    prune_media(["Quotation", "Bill"])
+
     tab_titles = ["Quotation Generator", "Bill Generator"]
     tab_quotation, tab_bill = st.tabs(tab_titles)
 
@@ -1,172 +1,563 @@
+import atexit
+import functools
+import hashlib
 import os
 import re
+import multiprocessing
+import shutil
+import socket
+import subprocess
+import tempfile
 import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 from pathlib import Path
 import docx
+import lxml.html
 import fitz  # PyMuPDF
-import markdown
+from markdown_it import MarkdownIt
 from PIL import Image
 from docx.document import Document as DocxDocumentObject # Renaming to avoid conflict with docx.Document()
-from docx.table import Table as DocxTableObject
-from docx.text.paragraph import Paragraph as DocxParagraphObject
-# Required for iterating through document body elements
-from docx.oxml.text.paragraph import CT_P
-from docx.oxml.table import CT_Tbl
+from docx.styles import BabelFish
 from docx2pdf import convert as docx_to_pdf_converter # For DOCX to PDF
+try:
+    # LibreOffice's Python-UNO bindings; they ship with LibreOffice rather than on PyPI
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
 
+log = logging.getLogger(__name__)
 
-def convert_pdf_to_md(pdf_path):
+# Clark-notation WordprocessingML tags, for reading DOCX body elements directly with lxml
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_P = W + 'p'
+W_TBL = W + 'tbl'
+W_R = W + 'r'
+W_T = W + 't'
+W_TAB = W + 'tab'
+W_PTAB = W + 'ptab'
+W_BR = W + 'br'
+W_CR = W + 'cr'
+W_NO_BREAK_HYPHEN = W + 'noBreakHyphen'
+W_RPR_B = W + 'rPr/' + W + 'b'
+W_RPR_I = W + 'rPr/' + W + 'i'
+W_VAL = W + 'val'
+W_DRAWING = W + 'drawing'
+W_TR = W + 'tr'
+W_TC = W + 'tc'
+W_TCPR_GRIDSPAN = W + 'tcPr/' + W + 'gridSpan'
+W_PPR_PSTYLE = W + 'pPr/' + W + 'pStyle'
+W_STYLE = W + 'style'
+W_STYLE_ID = W + 'styleId'
+W_TYPE = W + 'type'
+W_NAME = W + 'name'
+
+# Precompiled patterns for the md <-> txt/docx converters
+_BULLET_RE = re.compile(r'^\d+[.)]')
+_HEADER_RE = re.compile(r'#+\s+')
+_BOLD_RE = re.compile(r'\*\*|\*|__|\b_\b')
+_LINK_OR_IMG_RE = re.compile(r'(?P<img>!)?\[(?P<text>[^\]]+)\]\([^)]+\)')
+_CODE_RE = re.compile(r'```[^`]*```')
+# A ```/```markdown fence at the start of the text or after whitespace, up to the last fence
+_FENCE_RE = re.compile(r'(?:\A|(?<=\s))```(?:markdown)?(.*)```', re.DOTALL)
+
+
+# Markdown -> PDF page geometry: A4 in points, with 50pt margins on every side
+_A4_W, _A4_H = 595, 842
+_A4_MEDIABOX = fitz.Rect(0, 0, _A4_W, _A4_H)
+_A4_CONTENT_RECT = fitz.Rect(50, 50, _A4_W - 50, _A4_H - 50)
+
+# How far (points) a page's laid-out content may extend past the content rect before it
+# counts as clipped: Story's filled rect includes the last element's bottom margin (10px at most)
+_STORY_OVERFLOW_SLACK = 12
+
+# Blank space at the top of the first page, left free for the printed letterhead
+_LETTERHEAD_SPACER_HTML = "<div style=\"height: 3cm;\"></div>"
+
+# CSS for the Markdown -> PDF rendering
+_STYLING_CSS = """
+    body { font-family: Arial, sans-serif; margin: 0; line-height: 1.2; } /* Adjusted margin for snippet */
+    h1 { color: #333; margin-bottom: 10px; font-size: 24px; }
+    h2 { color: #444; margin-bottom: 8px; font-size: 20px; }
+    h3 { color: #555; margin-bottom: 6px; font-size: 16px; }
+    p { margin-top: 5px; margin-bottom: 5px; }
+    pre { background-color: #f5f5f5; padding: 8px; border-radius: 5px; white-space: pre-wrap; word-wrap: break-word; }
+    code { font-family: monospace; }
+    blockquote { border-left: 4px solid #ccc; padding-left: 15px; color: #777; margin: 10px 0; }
+    table { border-collapse: collapse; width: 100%; margin-bottom: 10px; }
+    th, td { border: 1px solid #ddd; padding: 6px; text-align: left; }
+    th { background-color: #f2f2f2; }
+    ul, ol { margin-top: 5px; margin-bottom: 5px; padding-left: 20px; }
+    li { margin-bottom: 3px; }
+"""
+
+# Shared Markdown renderer (CommonMark, with fenced code, plus GFM tables), set up once
+_MD = MarkdownIt('commonmark').enable('table')
+
+# HTML tags mapped onto python-docx structures when rendering Markdown to DOCX
+_HTML_HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+_HTML_BOLD_TAGS = {'strong', 'b'}
+_HTML_ITALIC_TAGS = {'em', 'i'}
+_HTML_LIST_STYLES = {'ul': 'List Bullet', 'ol': 'List Number'}
+# Elements whose content may mix blocks with inline text, and all elements laid out as blocks
+_HTML_CONTAINER_TAGS = {'div', 'blockquote', 'center', 'section', 'article', 'header', 'footer', 'address'}
+_HTML_BLOCK_TAGS = {'p', 'pre', 'table', 'hr', 'li', *_HTML_CONTAINER_TAGS, *_HTML_HEADING_LEVELS, *_HTML_LIST_STYLES}
+_HTML_SPACE_RE = re.compile(r'\s+')
+
+def _strip_link_or_image(match):
+    """Drop Markdown images entirely; replace links with their text."""
+    return '' if match.group('img') else match.group('text')
+
+
+# Embedded PDF image formats that are written to disk unchanged
+_NATIVE_IMAGE_EXTS = {'png', 'jpeg', 'jpg', 'gif', 'bmp'}
+
+# Upper bound (seconds) for one batched LibreOffice DOCX -> PDF run
+SOFFICE_BATCH_TIMEOUT = 300
+
+# How long (seconds) to wait for the persistent headless LibreOffice to accept UNO connections
+SOFFICE_CONNECT_TIMEOUT = 20
+
+# On-disk cache of Markdown conversions, so they survive process restarts
+MD_CACHE_DIR = Path(__file__).resolve().parent / '.cache' / 'md'
+# Part of every cache key: bump whenever a converter's Markdown output changes,
+# so results cached by older code are not reused
+MD_CACHE_VERSION = 1
+
+# Single-line str Markdown sources with these extensions are always paths, never content
+_MD_SOURCE_SUFFIXES = ('.md', '.markdown', '.txt')
+
+# Converters report failures as Markdown strings starting with one of these; they are never cached
+_CONVERSION_ERROR_PREFIXES = ('Error converting', 'Unsupported file format')
+
+# Page-parallel PDF extraction: below this many pages, pool start-up costs more than it saves
+PARALLEL_PDF_MIN_PAGES = 8
+PARALLEL_PDF_MAX_WORKERS = 4
+# Trim PyMuPDF's object store every this many pages while extracting
+PDF_STORE_SHRINK_INTERVAL = 10
+
+# Threads used to save a page's images when it has more than one
+PDF_IMAGE_SAVE_WORKERS = 4
+
+# Plain-text extraction flags: the default text flags, but with ligatures expanded to
+# their characters instead of kept as single glyphs
+PDF_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES
+
+
+def _heading_levels_by_style_id(doc):
+    """
+    Map each heading-like paragraph style id in a DOCX to its Markdown heading level.
+    
+    Built once per document so paragraphs only need a dict lookup on their
+    w:pStyle value. Styles that are not headings are left out of the map.
+    
+    Args:
+        doc: python-docx Document
+        
+    Returns:
+        dict: style id -> heading level (1-9; unnumbered "Heading" styles and Title map to 1)
+    """
+    heading_levels = {}
+    for style in doc.styles.element.iterchildren(W_STYLE):
+        name_element = style.find(W_NAME)
+        if style.get(W_TYPE) != 'paragraph' or name_element is None:
+            continue
+        # Stored names are internal ("heading 1"); convert to the UI names python-docx reports
+        name = BabelFish.internal2ui(name_element.get(W_VAL, ''))
+        if name.startswith('Heading'):
+            # Unnumbered "Heading" styles default to level 1
+            heading_levels[style.get(W_STYLE_ID)] = int(name[-1]) if name[-1].isdigit() else 1
+        elif name.lower() == 'title':
+            heading_levels[style.get(W_STYLE_ID)] = 1
+        elif name.lower() == 'subtitle':
+            heading_levels[style.get(W_STYLE_ID)] = 2
+    return heading_levels
+
+
+def _run_text(run):
+    """
+    Text of a w:r element, read the way python-docx's CT_R.text does.
+    
+    Tabs and line breaks are stored as elements rather than characters, so they are
+    mapped back here: w:tab/w:ptab -> tab, w:br/w:cr -> newline (page and column
+    breaks are dropped), w:noBreakHyphen -> '-'.
+    """
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or '')
+        elif tag == W_TAB or tag == W_PTAB:
+            parts.append('\t')
+        elif tag == W_BR:
+            if child.get(W_TYPE) not in ('page', 'column'):
+                parts.append('\n')
+        elif tag == W_CR:
+            parts.append('\n')
+        elif tag == W_NO_BREAK_HYPHEN:
+            parts.append('-')
+    return ''.join(parts)
+
+
+def _paragraph_text(p):
+    """Plain text of a w:p element, including runs nested in hyperlinks and the like."""
+    return ''.join(_run_text(run) for run in p.iter(W_R))
+
+
+def _table_cell_text(tc):
+    """Text of a w:tc element as a single Markdown table cell: paragraphs joined by spaces, pipes escaped."""
+    text = ' '.join(_paragraph_text(p) for p in tc.iter(W_P)).replace('\n', ' ').strip()
+    return text.replace('|', '\\|')
+
+
+def _table_row_cells(tr):
+    """
+    Markdown cell texts for a w:tr element, one per grid column.
+    
+    A horizontally merged cell (w:gridSpan > 1) is followed by empty cells for the
+    columns it covers, so later cells stay under their headers.
+    """
+    cells = []
+    for tc in tr.iterchildren(W_TC):
+        cells.append(_table_cell_text(tc))
+        grid_span = tc.find(W_TCPR_GRIDSPAN)
+        if grid_span is not None:
+            try:
+                cells.extend([''] * (int(grid_span.get(W_VAL, '1')) - 1))
+            except ValueError:
+                pass
+    return cells
+
+
+def _is_toggle_on(element):
+    """Return True for a present OOXML toggle property (w:b, w:i) unless it is explicitly turned off."""
+    return element is not None and element.get(W_VAL) not in ('0', 'false', 'off')
+
+
+def _save_pdf_image(image_bytes, ext, image_path):
+    """Write an extracted PDF image to disk, re-encoding non-native formats as PNG."""
+    if ext in _NATIVE_IMAGE_EXTS:
+        # Already a common format: write the embedded bytes as-is, no decode/re-encode
+        with open(image_path, 'wb') as image_file:
+            image_file.write(image_bytes)
+    else:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image.save(image_path)
+
+
+def _pdf_page_to_md(doc, page_num, pdf_path, extract_images=True):
+    """
+    Convert one page of an open PDF to Markdown, saving its images next to the PDF.
+    
+    Args:
+        doc (fitz.Document): The open PDF
+        page_num (int): Zero-based page index
+        pdf_path (str): Path of the PDF, used to place extracted images
+        extract_images (bool): Whether to save the page's images and reference them
+        
+    Returns:
+        str: Markdown content for the page
+    """
+    buf = io.StringIO()
+    write = buf.write # Bound once; called for every fragment
+    page = doc[page_num]
+
+    # Extract text
+    text = page.get_text("text", flags=PDF_TEXT_FLAGS)
+    
+    # Add page header
+    write(f"## Page {page_num + 1}\n")
+    
+    # Add text content
+    write(text)
+    write("\n\n")
+    
+    # Extract images; skip walking the page's image xrefs when the caller doesn't want them
+    image_list = page.get_images(full=True) if extract_images else []
+    
+    # Decode images serially (a fitz.Document must not be shared across threads), but hand
+    # the disk writes and PIL re-encodes, which release the GIL, to a thread pool
+    executor = ThreadPoolExecutor(PDF_IMAGE_SAVE_WORKERS) if len(image_list) > 1 else None
+    try:
+        saves = []
+        for img_index, img_info in enumerate(image_list):
+            xref = img_info[0]
+            base_image = doc.extract_image(xref)
+            ext = base_image["ext"]
+            # Common formats are written as-is; others (e.g. JPX, TIFF) are saved as PNG
+            img_filename = f"image_p{page_num + 1}_{img_index + 1}.{ext if ext in _NATIVE_IMAGE_EXTS else 'png'}"
+            image_path = os.path.join(os.path.dirname(pdf_path), img_filename)
+            if executor is None:
+                _save_pdf_image(base_image["image"], ext, image_path)
+            else:
+                saves.append(executor.submit(_save_pdf_image, base_image["image"], ext, image_path))
+            
+            # Add image reference to markdown
+            write(f"![Image {img_index + 1} from page {page_num + 1}]({img_filename})\n\n")
+        
+        for save in saves:
+            save.result() # Re-raise any write error
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # Drop page objects now and periodically trim MuPDF's object store, instead of waiting for GC
+    del page, image_list
+    if (page_num + 1) % PDF_STORE_SHRINK_INTERVAL == 0:
+        fitz.TOOLS.store_shrink(100)
+
+    return buf.getvalue()
+
+
+# Per-process state for the page worker pool: each worker opens the PDF once (fitz.Document isn't picklable)
+_worker_pdf_path = None
+_worker_pdf_doc = None
+_worker_extract_images = True
+
+
+def _init_pdf_page_worker(pdf_path, extract_images):
+    global _worker_pdf_path, _worker_pdf_doc, _worker_extract_images
+    _worker_pdf_path = pdf_path
+    _worker_pdf_doc = fitz.open(pdf_path)
+    _worker_extract_images = extract_images
+
+
+def _process_pdf_page(page_num):
+    return page_num, _pdf_page_to_md(_worker_pdf_doc, page_num, _worker_pdf_path, _worker_extract_images)
+
+
+def convert_pdf_to_md(pdf_path, extract_images=True):
     """
     Convert a PDF file to Markdown format.
     
+    PDFs with at least PARALLEL_PDF_MIN_PAGES pages are split across a process
+    pool, since PyMuPDF holds the GIL during text and image extraction.
+    
     Args:
         pdf_path (str): Path to the PDF file
+        extract_images (bool): Whether to save embedded images next to the PDF and
+            reference them from the Markdown
         
     Returns:
         str: Markdown content
     """
-    md_content = []
-    
     try:
         # Open the PDF file
         doc = fitz.open(pdf_path)
+        try:
+            page_count = doc.page_count
+            
+            if page_count < PARALLEL_PDF_MIN_PAGES:
+                # Process each page
+                return "".join(_pdf_page_to_md(doc, page_num, pdf_path, extract_images) for page_num in range(page_count))
+        finally:
+            # Release the document (and everything it retains) before returning or starting workers
+            doc.close()
+
+        # Collect pages as workers finish them, then stitch them back together in page order
+        page_md = [None] * page_count
+        with multiprocessing.Pool(
+            min(os.cpu_count() or 1, PARALLEL_PDF_MAX_WORKERS),
+            initializer=_init_pdf_page_worker,
+            initargs=(pdf_path, extract_images),
+        ) as pool:
+            for page_num, md in pool.imap_unordered(_process_pdf_page, range(page_count)):
+                page_md[page_num] = md
+        return "".join(page_md)
+    
+    except Exception as e:
+        return f"Error converting PDF to Markdown: {str(e)}"
+
+
+def _docx_runs_md(paragraph):
+    """
+    Render a paragraph's runs as Markdown with bold/italic markers.
+    
+    Markers are only opened or closed where the (bold, italic) style changes, so a
+    phrase Word split into several equally formatted runs comes out as one
+    **...** span instead of **a****b****c**. Whitespace at run edges is kept
+    outside the markers, where Markdown expects it.
+    
+    Args:
+        paragraph: lxml w:p element
         
-        # Process each page
-        for page_num, page in enumerate(doc):
-            # Extract text
-            text = page.get_text()
+    Returns:
+        str: Markdown for the paragraph's text
+    """
+    parts = []
+    open_markers = [] # '**' (bold) and '*' (italic), innermost last
+    pending_space = ''
+    for run in paragraph.findall(W_R):
+        text = _run_text(run)
+        core = text.strip()
+        if not core:
+            pending_space += text
+            continue
+
+        wanted = set()
+        if _is_toggle_on(run.find(W_RPR_B)):
+            wanted.add('**')
+        if _is_toggle_on(run.find(W_RPR_I)):
+            wanted.add('*')
+        # Add more run-level formatting checks if needed (underline, strikethrough, etc.)
+
+        # Close markers this run doesn't use (and any opened inside them), then open new ones
+        while any(marker not in wanted for marker in open_markers):
+            parts.append(open_markers.pop())
+        parts.append(pending_space + text[:len(text) - len(text.lstrip())])
+        for marker in ('**', '*'):
+            if marker in wanted and marker not in open_markers:
+                open_markers.append(marker)
+                parts.append(marker)
+        parts.append(core)
+        pending_space = text[len(text.rstrip()):]
+
+    parts.extend(reversed(open_markers))
+    parts.append(pending_space)
+    return ''.join(parts)
+
+
+def _iter_docx_blocks(doc):
+    """
+    Yield Markdown for each body element of a DOCX, in document order.
+    
+    Paragraphs are read straight from the underlying lxml elements instead of
+    building python-docx Paragraph/Run wrappers for every block.
+    
+    Args:
+        doc: python-docx Document
+        
+    Yields:
+        str: Markdown for one block (or table row), ending in newlines
+    """
+    heading_levels = _heading_levels_by_style_id(doc)
+
+    for block in doc.element.body.iterchildren():
+        if block.tag == W_P:
+            para_text = _paragraph_text(block)
+            if not para_text.strip():
+                # Keep empty lines as paragraph breaks, but not for paragraphs that only hold images
+                if block.find('.//' + W_DRAWING) is None:
+                    yield '\n'
+                continue
+
+            p_style = block.find(W_PPR_PSTYLE)
+            heading_level = heading_levels.get(p_style.get(W_VAL)) if p_style is not None else None
+            if heading_level is not None:
+                yield '#' * heading_level + ' ' + para_text.strip() + '\n\n'
+
+            else:
+                # Handle bold, italic, etc. within the paragraph run by run
+                yield _docx_runs_md(block) + '\n\n'
+
+        elif block.tag == W_TBL:
+            # Read rows and cells straight from w:tr / w:tc, without Table/_Row/_Cell wrappers
+            rows = block.findall(W_TR)
             
-            # Add page header
-            md_content.append(f"## Page {page_num + 1}\n")
+            if not rows: # Skip empty tables
+                continue
+
+            # Determine column widths for Markdown table alignment (optional, but good for looks)
+            # For simplicity, we are not doing this here, but it's a possible enhancement.
+
+            # Header row
+            header_cells = _table_row_cells(rows[0])
+            yield '| ' + ' | '.join(header_cells) + ' |\n'
             
-            # Add text content
-            md_content.append(text)
-            md_content.append("\n\n")
+            # Separator row
+            yield '| ' + ' | '.join('---' for _ in header_cells) + ' |\n'
             
-            # Extract images
-            image_list = page.get_images(full=True)
+            # Data rows
+            for row in rows[1:]:
+                yield '| ' + ' | '.join(_table_row_cells(row)) + ' |\n'
             
-            # Process images if any
-            for img_index, img_info in enumerate(image_list):
-                xref = img_info[0]
-                base_image = doc.extract_image(xref)
-                image_bytes = base_image["image"]
-                
-                # Create a PIL Image from the bytes
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                # Save image to a temporary file
-                img_filename = f"image_p{page_num + 1}_{img_index + 1}.png"
-                image_path = os.path.join(os.path.dirname(pdf_path), img_filename)
-                image.save(image_path)
-                
-                # Add image reference to markdown
-                md_content.append(f"![Image {img_index + 1} from page {page_num + 1}]({img_filename})\n\n")
-        
-        return "".join(md_content)
+            yield '\n'
+
+
+def _iter_docx_md(doc):
+    """
+    Yield the Markdown for a DOCX in chunks, collapsing 3+ consecutive newlines to 2.
+    
+    Blank runs are tracked while streaming, so no second pass over the full
+    output is needed. Leading blank lines are dropped.
     
+    Args:
+        doc: python-docx Document
+        
+    Yields:
+        str: Markdown chunks
+    """
+    trailing_newlines = 2 # Newlines at the end of the output so far; starts "full" to skip leading blanks
+    for chunk in _iter_docx_blocks(doc):
+        content = chunk.rstrip('\n')
+        newlines = len(chunk) - len(content)
+        if content:
+            trailing_newlines = 0
+        newlines = max(0, min(newlines, 2 - trailing_newlines))
+        trailing_newlines += newlines
+        if content or newlines:
+            yield content + '\n' * newlines
+
+
+def _to_str(chunks):
+    """Concatenate streamed Markdown chunks into one string."""
+    buf = io.StringIO()
+    write = buf.write # Bound once; called for every chunk
+    for chunk in chunks:
+        write(chunk)
+    return buf.getvalue()
+
+
+def convert_docx_to_md_file(docx_path, output_path):
+    """
+    Convert a DOCX file to Markdown, streaming it straight to disk.
+    
+    The Markdown is never held in memory as a whole; chunks are written through
+    a 1MB buffered writer as the document body is walked.
+    
+    Args:
+        docx_path (str): Path to the DOCX file
+        output_path (str): Path to save the markdown file
+        
+    Returns:
+        str: output_path if successful, None otherwise
+    """
+    try:
+        doc = docx.Document(docx_path)
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as file:
+            for chunk in _iter_docx_md(doc):
+                file.write(chunk)
+        return output_path
     except Exception as e:
-        return f"Error converting PDF to Markdown: {str(e)}"
+        print(f"Error converting DOCX to Markdown: {str(e)}")
+        return None
 
 
-def convert_docx_to_md(docx_path, output_path="bill_generator/bill.md"):
+def convert_docx_to_md(docx_path, output_path=None):
     """
     Convert a DOCX file to Markdown format, preserving element order.
     
     Args:
         docx_path (str): Path to the DOCX file
-        output_path (str): Path to save the markdown file
+        output_path (str, optional): Path to also save the markdown file to; nothing
+            is written when omitted
     Returns:
         str: Markdown content
     """
     try:
         doc = docx.Document(docx_path) # This is docx.api.Document, not docx.document.Document
-        md_content = []
-
-        for block in doc.element.body:
-            if isinstance(block, CT_P):
-                para = DocxParagraphObject(block, doc) # Use the aliased Paragraph
-                if not para.text.strip():
-                    if not any(isinstance(run.element, docx.oxml.drawing.CT_Drawing) for run in para.runs): # Keep empty lines if they don't contain only images
-                         md_content.append('\\n') # Preserve paragraph breaks more consistently
-                    # Check for images within paragraphs
-                    for run in para.runs:
-                        if isinstance(run.element, docx.oxml.drawing.CT_Drawing):
-                            # This part is complex: python-docx doesn't directly give image bytes from CT_Drawing.
-                            # It typically involves accessing inline_shapes or shapes.
-                            # For simplicity, we'll note an image was here. A more robust solution would extract it.
-                            # This requires iterating through doc.inline_shapes and matching, which is non-trivial here.
-                            # For now, let's rely on a more dedicated image extraction pass if needed,
-                            # or a library that handles this better for docx to md.
-                            # md_content.append(f"![Image in paragraph]\\n\\n") # Placeholder
-                            pass # Let's assume images are handled by a different mechanism or not primary for now
-
-                elif para.style.name.startswith('Heading'):
-                    heading_level = 0
-                    try:
-                        heading_level = int(para.style.name[-1])
-                    except ValueError: # Handle cases like "Heading" without a number
-                        if para.style.name.lower() == "title":
-                            heading_level = 1
-                        elif para.style.name.lower() == "subtitle":
-                            heading_level = 2
-                        else: # Default for unnumbered "Heading" styles
-                            heading_level = 1 # Or some other default
-                    
-                    if heading_level > 0:
-                         md_content.append('#' * heading_level + ' ' + para.text.strip() + '\\n\\n')
-                    else: # Fallback for styles that start with "Heading" but have no parsable level
-                         md_content.append('## ' + para.text.strip() + '\\n\\n')
-
-
-                else:
-                    # Handle bold, italic, etc. within the paragraph run by run
-                    line_content = []
-                    for run in para.runs:
-                        text = run.text
-                        if run.bold and run.italic:
-                            text = f"***{text}***"
-                        elif run.bold:
-                            text = f"**{text}**"
-                        elif run.italic:
-                            text = f"*{text}*"
-                        # Add more run-level formatting checks if needed (underline, strikethrough, etc.)
-                        line_content.append(text)
-                    md_content.append("".join(line_content) + '\\n\\n')
-
-            elif isinstance(block, CT_Tbl):
-                table = DocxTableObject(block, doc) # Use the aliased Table
-                # Start table
-                
-                if not table.rows: # Skip empty tables
-                    continue
-
-                # Determine column widths for Markdown table alignment (optional, but good for looks)
-                # For simplicity, we are not doing this here, but it's a possible enhancement.
-
-                # Header row
-                header_cells = table.rows[0].cells
-                md_content.append('| ' + ' | '.join(cell.text.strip() for cell in header_cells) + ' |\\n')
-                
-                # Separator row
-                md_content.append('| ' + ' | '.join('---' for _ in header_cells) + ' |\\n')
-                
-                # Data rows
-                for row in table.rows[1:]:
-                    md_content.append('| ' + ' | '.join(cell.text.strip() for cell in row.cells) + ' |\\n')
-                
-                md_content.append('\\n')
-        
-        # Clean up excessive newlines that might result from the above logic
-        final_md = "".join(md_content)
-        final_md = re.sub(r'(\\n){3,}', '\\n\\n', final_md) # Replace 3+ newlines with 2
-        
-        # Save the file to the output path
-        try:
-            with open(output_path, 'w', encoding='utf-8') as file:
-                file.write(final_md)
-        except Exception as file_error:
-            print(f"Warning: Could not save file to {output_path}: {str(file_error)}")
+        final_md = _to_str(_iter_docx_md(doc))
+        
+        # Save the file to the output path, if one was given
+        if output_path is not None:
+            try:
+                with open(output_path, 'w', encoding='utf-8') as file:
+                    file.write(final_md)
+            except Exception as file_error:
+                print(f"Warning: Could not save file to {output_path}: {str(file_error)}")
             
         return final_md.strip()
 
@@ -174,10 +565,130 @@ def convert_docx_to_md(docx_path, output_path="bill_generator/bill.md"):
         return f"Error converting DOCX to Markdown: {str(e)}"
 
 
+def _uno_property(name, value):
+    """Build a com.sun.star.beans.PropertyValue for UNO call arguments."""
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def _soffice_profile_arg(profile_dir):
+    """
+    soffice argument selecting a private user profile directory.
+    
+    Without it soffice uses the user's default profile, and a second soffice on
+    that profile hands its work to the running instance and exits without converting.
+    """
+    return f'-env:UserInstallation={Path(profile_dir).resolve().as_uri()}'
+
+
+def _free_local_port():
+    """Ask the OS for a currently unused localhost TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+class _ConverterWorker:
+    """
+    A headless LibreOffice process kept alive across DOCX -> PDF conversions.
+    
+    The first convert() starts soffice listening on a local UNO socket; later calls
+    reuse the same process and connection, so converting N files pays LibreOffice's
+    start-up once instead of N times. Calls are serialised with a lock, and a
+    process that has died is restarted on the next call.
+    
+    Each worker runs soffice with its own temporary profile on a free port, so it
+    neither captures other soffice runs (such as convert_docx_to_pdf_batch) nor
+    connects to another process's instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._process = None
+        self._desktop = None
+        self._port = None
+        self._profile_dir = None
+
+    @staticmethod
+    def available():
+        return uno is not None and shutil.which('soffice') is not None
+
+    def _start(self):
+        self.close() # Clear out a dead process and its profile before starting a new one
+        self._profile_dir = tempfile.mkdtemp(prefix='soffice-profile-')
+        self._port = _free_local_port()
+        self._process = subprocess.Popen(
+            [shutil.which('soffice'), _soffice_profile_arg(self._profile_dir),
+             '--headless', '--invisible', '--nologo', '--norestore',
+             f'--accept=socket,host=localhost,port={self._port};urp;'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context)
+        url = f'uno:socket,host=localhost,port={self._port};urp;StarOffice.ComponentContext'
+        deadline = time.monotonic() + SOFFICE_CONNECT_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(url)
+                break
+            except Exception:
+                # NoConnectException until soffice has started listening
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    self.close()
+                    raise
+                time.sleep(0.25)
+        self._desktop = context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', context)
+
+    def convert(self, docx_path, output_pdf_path):
+        with self._lock:
+            if self._desktop is None or self._process.poll() is not None:
+                self._start()
+            try:
+                document = self._desktop.loadComponentFromURL(
+                    uno.systemPathToFileUrl(os.path.abspath(docx_path)), '_blank', 0,
+                    (_uno_property('Hidden', True),))
+                try:
+                    document.storeToURL(
+                        uno.systemPathToFileUrl(os.path.abspath(output_pdf_path)),
+                        (_uno_property('FilterName', 'writer_pdf_Export'),))
+                finally:
+                    document.close(True)
+            except Exception:
+                # A dead soffice leaves a disposed bridge behind; start afresh next time
+                if self._process.poll() is not None:
+                    self._desktop = None
+                raise
+
+    def close(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        if self._profile_dir is not None:
+            shutil.rmtree(self._profile_dir, ignore_errors=True)
+        self._process = None
+        self._desktop = None
+        self._profile_dir = None
+
+
+_converter_worker = _ConverterWorker()
+atexit.register(_converter_worker.close)
+
+
 def convert_docx_to_pdf(docx_path, output_pdf_path):
     """
     Convert a DOCX file to PDF format.
     
+    Uses the persistent LibreOffice worker when the UNO bindings and soffice are
+    available, and docx2pdf otherwise or if the worker fails.
+    
     Args:
         docx_path (str): Path to the DOCX file.
         output_pdf_path (str): Path to save the generated PDF file.
@@ -185,6 +696,12 @@ def convert_docx_to_pdf(docx_path, output_pdf_path):
     Returns:
         bool: True if conversion was successful, False otherwise.
     """
+    if _ConverterWorker.available():
+        try:
+            _converter_worker.convert(docx_path, output_pdf_path)
+            return True
+        except Exception as e:
+            print(f"LibreOffice worker failed, falling back to docx2pdf: {str(e)}")
     try:
         docx_to_pdf_converter(docx_path, output_pdf_path)
         return True
@@ -199,6 +716,68 @@ def convert_docx_to_pdf(docx_path, output_pdf_path):
         return False
 
 
+def convert_docx_to_pdf_batch(docx_paths, outdir):
+    """
+    Convert several DOCX files to PDF with a single headless LibreOffice run.
+    
+    One soffice process converts the whole batch, so process start-up and font
+    loading are paid once instead of per file. Falls back to converting each file
+    with docx2pdf for a single file or when soffice is not on PATH.
+    
+    Args:
+        docx_paths (list): Paths to the DOCX files.
+        outdir (str): Directory to write the PDFs to (named after each DOCX).
+        
+    Returns:
+        bool: True if every file was converted, False otherwise (including when two
+            inputs share a file name stem, since their PDFs would collide).
+    """
+    docx_paths = [str(path) for path in docx_paths]
+    if not docx_paths:
+        return True
+
+    # Outputs are named after each DOCX, so inputs sharing a stem would overwrite each other
+    stems = [os.path.normcase(Path(path).stem) for path in docx_paths]
+    duplicates = sorted({path for path, stem in zip(docx_paths, stems) if stems.count(stem) > 1})
+    if duplicates:
+        print(f"Error converting DOCX batch to PDF: these files would write the same PDF: {', '.join(duplicates)}")
+        return False
+
+    soffice = shutil.which('soffice')
+    if soffice is None or len(docx_paths) == 1:
+        return all(
+            convert_docx_to_pdf(path, os.path.join(outdir, Path(path).stem + '.pdf'))
+            for path in docx_paths
+        )
+
+    # soffice exits 0 even when a file fails to load, so check each expected PDF was
+    # (re)written during this run; a private profile keeps the run from being handed
+    # to an already running LibreOffice instance
+    pdf_paths = [os.path.join(outdir, Path(path).stem + '.pdf') for path in docx_paths]
+    started = time.time() - 1 # Allow for coarse filesystem timestamps
+    try:
+        with tempfile.TemporaryDirectory(prefix='soffice-profile-') as profile_dir:
+            subprocess.run(
+                [soffice, _soffice_profile_arg(profile_dir), '--headless',
+                 '--convert-to', 'pdf', '--outdir', str(outdir), *docx_paths],
+                check=True,
+                capture_output=True,
+                timeout=SOFFICE_BATCH_TIMEOUT,
+            )
+        missing = [path for path in pdf_paths
+                   if not os.path.exists(path) or os.path.getmtime(path) < started]
+        if missing:
+            print(f"Error converting DOCX batch to PDF: LibreOffice did not produce {', '.join(missing)}")
+            return False
+        return True
+    except subprocess.TimeoutExpired:
+        print(f"Error converting DOCX batch to PDF: LibreOffice did not finish within {SOFFICE_BATCH_TIMEOUT}s.")
+        return False
+    except subprocess.CalledProcessError as e:
+        print(f"Error converting DOCX batch to PDF: {e.stderr.decode(errors='replace').strip() or e}")
+        return False
+
+
 def convert_txt_to_md(txt_path):
     """
     Convert a TXT file to Markdown format.
@@ -215,40 +794,100 @@ def convert_txt_to_md(txt_path):
         
         # Simple heuristics to identify structure
         lines = content.split('\n')
-        md_content = []
+        buf = io.StringIO()
+        write = buf.write # Bound once; called for every line
         
         for line in lines:
             # Skip empty lines
             if not line.strip():
-                md_content.append('\n')
+                write('\n')
                 continue
             
             # Check if line might be a heading (all caps or ends with colon)
             if line.isupper() or line.strip().endswith(':'):
-                md_content.append(f"## {line}\n\n")
+                write(f"## {line}\n\n")
             # Check if line starts with a number or bullet
-            elif re.match(r'^\d+[\.\)]', line.strip()) or line.strip().startswith('•'):
-                md_content.append(f"{line}\n")
+            elif _BULLET_RE.match(line.strip()) or line.strip().startswith('•'):
+                write(f"{line}\n")
             else:
-                md_content.append(f"{line}\n")
+                write(f"{line}\n")
         
-        return "".join(md_content)
+        return buf.getvalue()
     
     except Exception as e:
         return f"Error converting TXT to Markdown: {str(e)}"
 
 
+class _ConversionFailed(Exception):
+    """Carries a converter's error message out of the cache, so it isn't memoized."""
+
+
+@functools.lru_cache(maxsize=128)
+def _convert_file_to_md_cached(file_path, mtime_ns, size):
+    """
+    Convert a file to Markdown, memoized in memory and on disk under MD_CACHE_DIR.
+    
+    The modification time and size are part of the key, so an edited file misses the
+    cache instead of returning stale Markdown; so is MD_CACHE_VERSION, so output
+    from older converter code is not reused.
+    
+    Args:
+        file_path (str): Absolute path to the file
+        mtime_ns (int): The file's st_mtime_ns
+        size (int): The file's st_size
+        
+    Returns:
+        str: Markdown content
+    """
+    key = hashlib.sha1(f"{MD_CACHE_VERSION}\0{file_path}\0{mtime_ns}\0{size}".encode('utf-8')).hexdigest()
+    cache_path = MD_CACHE_DIR / f"{key}.md"
+    try:
+        return cache_path.read_text(encoding='utf-8')
+    except OSError:
+        pass
+
+    md_content = _convert_file_to_md(Path(file_path))
+    if md_content.startswith(_CONVERSION_ERROR_PREFIXES):
+        raise _ConversionFailed(md_content)
+
+    try:
+        MD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a concurrent reader never sees a partial file
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(md_content, encoding='utf-8')
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not cache Markdown for {file_path}: {str(e)}")
+    return md_content
+
+
 def convert_file_to_md(file_path):
     """
     Convert a file to Markdown based on its extension.
     
+    Results are cached by (path, modification time, size), in memory and on disk,
+    so converting an unchanged file again skips the parse. Errors aren't cached.
+    
     Args:
         file_path (str): Path to the file
         
     Returns:
         str: Markdown content
     """
-    file_path = Path(file_path)
+    file_path = Path(file_path).resolve()
+    try:
+        stat = file_path.stat()
+    except OSError:
+        # Let the converter report the missing/unreadable file as usual
+        return _convert_file_to_md(file_path)
+    try:
+        return _convert_file_to_md_cached(str(file_path), stat.st_mtime_ns, stat.st_size)
+    except _ConversionFailed as e:
+        return str(e)
+
+
+def _convert_file_to_md(file_path):
+    """Dispatch a file to the Markdown converter for its extension, without caching."""
     extension = file_path.suffix.lower()
     
     if extension == '.pdf':
@@ -280,12 +919,48 @@ def save_markdown_file(markdown_content, output_path):
         print(f"Error saving markdown file: {str(e)}")
         return False
 
-def convert_md_to_pdf(md_path, output_path):
+def _read_md_source(md_source):
     """
-    Convert a Markdown file to PDF format with proper rendering.
+    Resolve a Markdown source to its content.
+    
+    A str is read as a path when it is a single line that names an existing file or
+    ends in a Markdown/text extension, so a missing file raises instead of being
+    rendered as its own name; any other str is the Markdown content itself.
     
     Args:
-        md_path (str): Path to the Markdown file
+        md_source (str | Path | file-like): A path to a Markdown file, an open text or
+            binary stream, or the Markdown content itself
+        
+    Returns:
+        str: Markdown content
+    """
+    if hasattr(md_source, 'read'):
+        content = md_source.read()
+        return content.decode('utf-8') if isinstance(content, bytes) else content
+    if isinstance(md_source, str) and not _looks_like_md_path(md_source):
+        return md_source
+    with open(md_source, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+def _looks_like_md_path(text):
+    """Whether a str passed as a Markdown source should be treated as a file path."""
+    if '\n' in text:
+        return False
+    if text.strip().lower().endswith(_MD_SOURCE_SUFFIXES):
+        return True
+    try:
+        return os.path.isfile(text)
+    except (OSError, ValueError):
+        return False
+
+
+def convert_md_to_pdf(md_source, output_path):
+    """
+    Convert Markdown to PDF format with proper rendering.
+    
+    Args:
+        md_source (str | Path | file-like): Markdown file path, stream or content
         output_path (str): Path to save the PDF file
         
     Returns:
@@ -293,147 +968,286 @@ def convert_md_to_pdf(md_path, output_path):
     """
     try:
         # Read markdown content
-        with open(md_path, 'r', encoding='utf-8') as file:
-            md_content = file.read()
-
-        # --- Enhanced logic to find and extract the main Markdown block ---
-        cleaned_md_content = md_content # Default to original content
-        
-        # Try to find the start of a potential ```markdown block or ``` block
-        block_start_variants = ["```markdown", "```"]
-        actual_start_marker = None
-        start_index = -1
-
-        for marker in block_start_variants:
-            idx = md_content.find(marker)
-            if idx != -1:
-                # Ensure we don't select a marker that's part of a larger word or inside another block
-                # This is a simple check; more complex scenarios might need regex
-                if idx == 0 or md_content[idx-1].isspace(): 
-                    start_index = idx + len(marker) # Start after the marker
-                    actual_start_marker = marker
-                    break
-        
-        if actual_start_marker: # If we found a start marker
-            # Find the corresponding end marker ```, searching from after the start marker
-            end_index = md_content.rfind("```", start_index)
-            
-            if end_index != -1:
-                # Extract the content between the markers
-                extracted_block = md_content[start_index:end_index].strip()
-                cleaned_md_content = extracted_block
-            else:
-                # If no end marker, but we had a start, it could be that the LLM just prepended text
-                # and the rest is the document without a final fence. This is a heuristic.
-                # For now, if it started with a fence but didn't end with one, we might have an issue.
-                # Let's assume for now that if a start marker is found, an end marker should exist for a clean block.
-                # If only a start marker is found, the original stripping logic might be safer if it applied.
-                # Fallback to simple stripping if the complex extraction isn't clean.
-                stripped_md = md_content.strip()
-                if stripped_md.startswith(actual_start_marker) and stripped_md.endswith("```"):
-                    lines = stripped_md.split('\n')
-                    if lines:
-                        lines.pop(0)
-                    if lines and lines[-1].strip() == "```":
-                        lines.pop(-1)
-                    cleaned_md_content = "\n".join(lines)
-                # else: cleaned_md_content remains md_content or the result of the more specific extraction
-        else:
-            # No ```markdown or ``` start found, try simple stripping for just ```
-            stripped_md = md_content.strip()
-            if stripped_md.startswith("```") and stripped_md.endswith("```"):
-                lines = stripped_md.split('\n')
-                if lines: lines.pop(0) # remove first line
-                if lines and lines[-1].strip() == "```": lines.pop(-1) # remove last line
-                cleaned_md_content = "\n".join(lines)
-        # --- End of enhanced logic ---
-
-        # --- DEBUG PRINT for cleaned_md_content --- #
-        print("--- Cleaned MD Content for Markdown Parser ---")
-        print(repr(cleaned_md_content)) # Use repr() to see exact string with newlines
-        print("---------------------------------------------")
+        md_content = _read_md_source(md_source)
 
-        # Convert cleaned markdown to an HTML snippet
-        html_snippet = markdown.markdown(cleaned_md_content, extensions=['tables', 'fenced_code'])
+        pdf_bytes = convert_md_content_to_pdf(md_content)
+        if pdf_bytes is None:
+            return False
 
-        # Prepend letterhead spacer div to the HTML snippet
-        letterhead_spacer_html = "<div style=\"height: 3cm;\"></div>" # Approx 2cm spacer
-        html_snippet_with_spacer = letterhead_spacer_html + html_snippet
-
-        # --- DEBUG PRINT for HTML snippet --- #
-        print("--- Generated HTML Snippet for PDF Conversion ---")
-        print(html_snippet_with_spacer) # Print the one with the spacer
-        print("--------------------------------------------------")
-
-        # Define CSS for styling
-        styling_css = """
-            body { font-family: Arial, sans-serif; margin: 0; line-height: 1.2; } /* Adjusted margin for snippet */
-            h1 { color: #333; margin-bottom: 10px; font-size: 24px; }
-            h2 { color: #444; margin-bottom: 8px; font-size: 20px; }
-            h3 { color: #555; margin-bottom: 6px; font-size: 16px; }
-            p { margin-top: 5px; margin-bottom: 5px; }
-            pre { background-color: #f5f5f5; padding: 8px; border-radius: 5px; white-space: pre-wrap; word-wrap: break-word; }
-            code { font-family: monospace; }
-            blockquote { border-left: 4px solid #ccc; padding-left: 15px; color: #777; margin: 10px 0; }
-            table { border-collapse: collapse; width: 100%; margin-bottom: 10px; }
-            th, td { border: 1px solid #ddd; padding: 6px; text-align: left; }
-            th { background-color: #f2f2f2; }
-            ul, ol { margin-top: 5px; margin-bottom: 5px; padding-left: 20px; }
-            li { margin-bottom: 3px; }
-        """
-        
-        # Create PDF document
-        doc = fitz.open()
-        
-        # Add a new page with A4 dimensions
-        page = doc.new_page(width=595, height=842) # A4 dimensions in points
-        
-        # Define the rectangle for content insertion (with margins)
-        # Margins: 50 points top/bottom, 50 points left/right
-        rect = fitz.Rect(50, 50, 595 - 50, 842 - 50)
-        
-        # Use insert_htmlbox with the HTML snippet and the separate CSS string
-        # Wrap the snippet in a basic body tag for context if needed by fitz, though often not necessary for snippets
-        # However, applying body styles from CSS might need it.
-        # Let's try with a minimal body wrapper.
-        html_for_fitz = f"""<!DOCTYPE html><html><head><meta charset="utf-8"></head>
-        <body>{html_snippet_with_spacer}</body></html>""" # Use the snippet with spacer
+        # Save PDF
+        with open(output_path, 'wb') as file:
+            file.write(pdf_bytes)
+
+        return True
+    except Exception as e:
+        print(f"Error converting Markdown to PDF: {str(e)}")
+        return False
 
-        # The 'archive' parameter is for resource management (e.g., external images referenced in HTML)
-        # For self-contained HTML like ours, None should be appropriate.
-        archive_param = None 
 
-        returned_value = page.insert_htmlbox(rect, html_for_fitz, css=styling_css, archive=archive_param)
+def _render_html_pages(html):
+    """
+    Lay HTML out over as many A4 pages as it needs, with fitz.Story.
+    
+    Content that doesn't fit on one page flows onto the next instead of being squeezed
+    into a single fixed box. Story can't split a single element that is taller than the
+    page, though; it would be clipped, so that case is reported instead of rendered.
+    
+    Args:
+        html (str): Complete HTML document
         
-        # Check for specific error codes or overflow
-        if returned_value == -1:
-            print("Warning: fitz.insert_htmlbox general error (code -1).")
-        elif returned_value == -2:
-            print("Warning: fitz.insert_htmlbox invalid HTML/CSS (code -2).")
-        elif isinstance(returned_value, fitz.Rect) and not returned_value.is_empty:
-            # This means some content did not fit into the provided rectangle (overflow)
-            print(f"Warning: fitz.insert_htmlbox indicates content overflow. Overflow area: {returned_value}")
-        # If returned_value is a fitz.Rect and is_empty is True, it means all content fitted.
-        # No specific message for this case, as it's the expected success.
+    Returns:
+        bytes: The PDF, or None if some content doesn't fit on a page
+    """
+    # The 'archive' parameter is for resource management (e.g., external images referenced in HTML)
+    # For self-contained HTML like ours, None should be appropriate.
+    story = fitz.Story(html=html, user_css=_STYLING_CSS, archive=None)
 
-        # Save PDF
-        doc.save(output_path)
-        doc.close()
+    # Write the pages straight into an in-memory PDF
+    pdf_buffer = io.BytesIO()
+    writer = fitz.DocumentWriter(pdf_buffer)
+    more = True
+    while more:
+        device = writer.begin_page(_A4_MEDIABOX)
+        more, filled = story.place(_A4_CONTENT_RECT)
+        filled = fitz.Rect(filled)
+        if (filled.y1 > _A4_CONTENT_RECT.y1 + _STORY_OVERFLOW_SLACK
+                or filled.x1 > _A4_CONTENT_RECT.x1 + _STORY_OVERFLOW_SLACK):
+            return None # Overflowing content would be cut off at the page edge
+        story.draw(device)
+        writer.end_page()
+    writer.close()
+    return pdf_buffer.getvalue()
+
+
+def _render_html_scaled(html):
+    """
+    Render HTML onto a single A4 page, scaled down until all of it fits.
+    
+    Args:
+        html (str): Complete HTML document
         
-        # Redundant temporary HTML file handling is removed.
+    Returns:
+        bytes: The PDF
+    """
+    story = fitz.Story(html=html, user_css=_STYLING_CSS, archive=None)
+    # Find the smallest enlargement of the content rect that holds everything, lay the
+    # story out in it, then draw it shrunk back into the real content rect
+    fit = story.fit_scale(_A4_CONTENT_RECT, scale_min=1)
+    story.reset()
+    story.place(fit.rect)
+    scale = 1 / fit.parameter
+    x0, y0 = _A4_CONTENT_RECT.x0, _A4_CONTENT_RECT.y0
+    matrix = fitz.Matrix(1, 0, 0, 1, -x0, -y0) * fitz.Matrix(scale, scale) * fitz.Matrix(1, 0, 0, 1, x0, y0)
+
+    pdf_buffer = io.BytesIO()
+    writer = fitz.DocumentWriter(pdf_buffer)
+    device = writer.begin_page(_A4_MEDIABOX)
+    story.draw(device, matrix)
+    writer.end_page()
+    writer.close()
+    return pdf_buffer.getvalue()
+
+
+def convert_md_content_to_pdf(md_content):
+    """
+    Convert Markdown content to PDF bytes in memory, without touching the disk.
+    
+    Args:
+        md_content (str): Markdown content to render
         
-        return True
+    Returns:
+        bytes: The rendered PDF, or None if the conversion failed
+    """
+    try:
+        # Extract the main Markdown block if the content is wrapped in a ``` or ```markdown
+        # fence, possibly after some preamble text; otherwise use the content as is
+        fence_match = _FENCE_RE.search(md_content)
+        cleaned_md_content = fence_match.group(1).strip() if fence_match else md_content
+        # Arguments are only formatted when DEBUG is enabled for this logger
+        log.debug('cleaned md: %r', cleaned_md_content)
+
+        # Convert cleaned markdown to an HTML snippet
+        html_snippet = _MD.render(cleaned_md_content)
+
+        # Prepend letterhead spacer div to the HTML snippet
+        html_snippet_with_spacer = _LETTERHEAD_SPACER_HTML + html_snippet
+        log.debug('html: %s', html_snippet_with_spacer)
+
+        # Wrap the snippet in a basic body tag so the body styles from the CSS apply
+        html_for_fitz = f"""<!DOCTYPE html><html><head><meta charset="utf-8"></head>
+        <body>{html_snippet_with_spacer}</body></html>""" # Use the snippet with spacer
+
+        pdf_bytes = _render_html_pages(html_for_fitz)
+        if pdf_bytes is None:
+            # Some element (e.g. a table row with many lines) is taller than a page and would be
+            # clipped; shrink the whole document onto one page instead of losing content
+            log.warning("Markdown content has an element taller than one A4 page; scaling it to fit a single page")
+            pdf_bytes = _render_html_scaled(html_for_fitz)
+        
+        return pdf_bytes
     except Exception as e:
         print(f"Error converting Markdown to PDF: {str(e)}")
-        return False
+        return None
+
+
+def _add_html_text(paragraph, text, bold, italic, strip_leading):
+    """
+    Append HTML text to a DOCX paragraph as one run, with whitespace collapsed as a browser would.
+    
+    Newlines in the HTML source are soft breaks, not line breaks, so every whitespace
+    sequence becomes a single space; leading whitespace is dropped at the start of a
+    line (after a <br> or at the start of the paragraph) or after a space.
+    
+    Returns:
+        bool: Whether whitespace at the start of the next text should be dropped
+    """
+    text = _HTML_SPACE_RE.sub(' ', text)
+    if strip_leading:
+        text = text.lstrip(' ')
+    if not text:
+        return strip_leading
+    run = paragraph.add_run(text)
+    run.bold = bold or None
+    run.italic = italic or None
+    return text.endswith(' ')
+
+
+def _add_html_runs(paragraph, element, bold=False, italic=False, strip_leading=True):
+    """
+    Append the inline content of an HTML element to a DOCX paragraph as styled runs.
+    
+    Returns:
+        bool: Whether whitespace at the start of the next text should be dropped
+    """
+    if element.text:
+        strip_leading = _add_html_text(paragraph, element.text, bold, italic, strip_leading)
+    for child in element:
+        if not isinstance(child.tag, str):
+            pass # Comments and processing instructions carry no text
+        elif child.tag == 'br':
+            _rstrip_runs(paragraph)
+            paragraph.add_run().add_break()
+            strip_leading = True
+        elif child.tag not in _HTML_LIST_STYLES: # Nested lists are added as their own blocks
+            strip_leading = _add_html_runs(paragraph, child,
+                                           bold or child.tag in _HTML_BOLD_TAGS,
+                                           italic or child.tag in _HTML_ITALIC_TAGS,
+                                           strip_leading)
+        if child.tail:
+            strip_leading = _add_html_text(paragraph, child.tail, bold, italic, strip_leading)
+    return strip_leading
+
+
+def _rstrip_runs(paragraph):
+    """Drop trailing spaces from a DOCX paragraph, removing runs that end up empty."""
+    while paragraph.runs:
+        run = paragraph.runs[-1]
+        text = run.text.rstrip(' ')
+        if text:
+            run.text = text
+            return
+        run._r.getparent().remove(run._r)
+
+
+def _add_html_paragraph(paragraph, element, bold=False):
+    """Fill a DOCX paragraph from an HTML element, without trailing whitespace."""
+    _add_html_runs(paragraph, element, bold=bold)
+    _rstrip_runs(paragraph)
+
+
+def _add_html_table(doc, table_element):
+    """Add an HTML <table> to the document as a DOCX table, with bold header cells."""
+    rows = [[cell for cell in tr if cell.tag in ('th', 'td')] for tr in table_element.iter('tr')]
+    rows = [row for row in rows if row]
+    if not rows:
+        return
+    table = doc.add_table(rows=len(rows), cols=max(len(row) for row in rows))
+    table.style = 'Table Grid'
+    for row, docx_row in zip(rows, table.rows):
+        for cell, docx_cell in zip(row, docx_row.cells):
+            _add_html_paragraph(docx_cell.paragraphs[0], cell, bold=cell.tag == 'th')
+
+
+def _add_html_inline_paragraph(doc, items):
+    """
+    Add a paragraph for a run of inline HTML content between block elements.
+    
+    Args:
+        doc: python-docx Document
+        items (list): Text strings and inline elements, in document order
+    """
+    if not any(item.strip() if isinstance(item, str) else item.text_content().strip() for item in items):
+        return
+    paragraph = doc.add_paragraph()
+    strip_leading = True
+    for item in items:
+        if isinstance(item, str):
+            strip_leading = _add_html_text(paragraph, item, False, False, strip_leading)
+        elif item.tag == 'br':
+            if paragraph.runs: # A break before any text would only add a blank line
+                _rstrip_runs(paragraph)
+                paragraph.add_run().add_break()
+                strip_leading = True
+        else:
+            strip_leading = _add_html_runs(paragraph, item,
+                                           item.tag in _HTML_BOLD_TAGS,
+                                           item.tag in _HTML_ITALIC_TAGS,
+                                           strip_leading)
+    _rstrip_runs(paragraph)
+
+
+def _add_html_blocks(doc, parent):
+    """
+    Add the content of an HTML element to a DOCX document.
+    
+    Block-level children become their own paragraphs, headings, lists or tables; any
+    text and inline elements around them (the parent's text, children's tails, raw
+    inline HTML such as "<br>\nText") are grouped into paragraphs in between.
+    """
+    inline_items = [parent.text] if parent.text else []
+    for element in parent:
+        tag = element.tag
+        if isinstance(tag, str) and tag not in _HTML_BLOCK_TAGS:
+            inline_items.append(element)
+        elif isinstance(tag, str):
+            _add_html_inline_paragraph(doc, inline_items)
+            inline_items = []
+            _add_html_block(doc, element)
+        # Comments and processing instructions carry no text, but their tails do
+        if element.tail:
+            inline_items.append(element.tail)
+    _add_html_inline_paragraph(doc, inline_items)
+
+
+def _add_html_block(doc, element):
+    """Add one block-level HTML element to a DOCX document."""
+    tag = element.tag
+    if tag in _HTML_HEADING_LEVELS:
+        _add_html_paragraph(doc.add_heading(level=_HTML_HEADING_LEVELS[tag]), element)
+    elif tag in _HTML_LIST_STYLES:
+        for li in element.iterchildren('li'):
+            _add_html_paragraph(doc.add_paragraph(style=_HTML_LIST_STYLES[tag]), li)
+            # Nested lists follow their parent item
+            for child in li:
+                if child.tag in _HTML_LIST_STYLES:
+                    _add_html_block(doc, child)
+    elif tag == 'table':
+        _add_html_table(doc, element)
+    elif tag in _HTML_CONTAINER_TAGS:
+        # Mixed content, e.g. <div>Signed by <b>Boss</b></div> or a div holding paragraphs
+        _add_html_blocks(doc, element)
+    elif tag == 'pre':
+        doc.add_paragraph(element.text_content().rstrip('\n'))
+    elif tag != 'hr':
+        _add_html_paragraph(doc.add_paragraph(), element)
 
 
-def convert_md_to_docx(md_path, output_path):
+def convert_md_to_docx(md_source, output_path):
     """
-    Convert a Markdown file to DOCX format.
+    Convert Markdown to DOCX format.
     
     Args:
-        md_path (str): Path to the Markdown file
+        md_source (str | Path | file-like): Markdown file path, stream or content
         output_path (str): Path to save the DOCX file
         
     Returns:
@@ -441,23 +1255,18 @@ def convert_md_to_docx(md_path, output_path):
     """
     try:
         # Read markdown content
-        with open(md_path, 'r', encoding='utf-8') as file:
-            md_content = file.read()
+        md_content = _read_md_source(md_source)
         
         # Convert markdown to HTML
-        html_content = markdown.markdown(md_content)
+        html_content = _MD.render(md_content)
         
         # Create a new Word document
         doc = docx.Document()
         
-        # Parse HTML and add content to Word document
-        # This is a simplified approach - for complex documents, 
-        # you might need a more sophisticated HTML parser
-        for line in html_content.split('\n'):
-            # Remove HTML tags (simplified approach)
-            clean_line = re.sub(r'<.*?>', '', line).strip()
-            if clean_line:
-                doc.add_paragraph(clean_line)
+        # Parse the HTML once and map each top-level block onto the document,
+        # keeping headings, lists, tables and bold/italic runs
+        root = lxml.html.fragment_fromstring(html_content, create_parent='div')
+        _add_html_blocks(doc, root)
         
         # Save the document
         doc.save(output_path)
@@ -468,12 +1277,12 @@ def convert_md_to_docx(md_path, output_path):
         return False
 
 
-def convert_md_to_txt(md_path, output_path):
+def convert_md_to_txt(md_source, output_path):
     """
-    Convert a Markdown file to plain text format.
+    Convert Markdown to plain text format.
     
     Args:
-        md_path (str): Path to the Markdown file
+        md_source (str | Path | file-like): Markdown file path, stream or content
         output_path (str): Path to save the TXT file
         
     Returns:
@@ -481,20 +1290,17 @@ def convert_md_to_txt(md_path, output_path):
     """
     try:
         # Read markdown content
-        with open(md_path, 'r', encoding='utf-8') as file:
-            md_content = file.read()
+        md_content = _read_md_source(md_source)
         
         # Remove markdown formatting (simplified approach)
         # Remove headers
-        txt_content = re.sub(r'#+\s+', '', md_content)
+        txt_content = _HEADER_RE.sub('', md_content)
         # Remove bold/italic
-        txt_content = re.sub(r'\*\*|\*|__|\b_\b', '', txt_content)
-        # Remove links
-        txt_content = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', txt_content)
-        # Remove images
-        txt_content = re.sub(r'!\[([^\]]+)\]\([^)]+\)', '', txt_content)
+        txt_content = _BOLD_RE.sub('', txt_content)
+        # Remove images and keep link text, in one pass
+        txt_content = _LINK_OR_IMG_RE.sub(_strip_link_or_image, txt_content)
         # Remove code blocks
-        txt_content = re.sub(r'```[^`]*```', '', txt_content)
+        txt_content = _CODE_RE.sub('', txt_content)
         
         # Save as text file
         with open(output_path, 'w', encoding='utf-8') as file:
@@ -506,12 +1312,12 @@ def convert_md_to_txt(md_path, output_path):
         return False
 
 
-def convert_md_to_file(md_path, output_path):
+def convert_md_to_file(md_source, output_path):
     """
-    Convert a Markdown file to another format based on the output extension.
+    Convert Markdown to another format based on the output extension.
     
     Args:
-        md_path (str): Path to the Markdown file
+        md_source (str | Path | file-like): Markdown file path, stream or content
         output_path (str): Path to save the output file
         
     Returns:
@@ -521,11 +1327,11 @@ def convert_md_to_file(md_path, output_path):
     extension = output_path.suffix.lower()
     
     if extension == '.pdf':
-        return convert_md_to_pdf(md_path, output_path)
+        return convert_md_to_pdf(md_source, output_path)
     elif extension == '.docx':
-        return convert_md_to_docx(md_path, output_path)
+        return convert_md_to_docx(md_source, output_path)
     elif extension == '.txt':
-        return convert_md_to_txt(md_path, output_path)
+        return convert_md_to_txt(md_source, output_path)
     else:
         print(f"Unsupported output format: {extension}")
         return False